@@ -1,6 +1,14 @@
 from typing import List, Dict, Tuple
+from contextlib import nullcontext
+import hashlib
 import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import torch
 from fastopic import FASTopic
+from sentence_transformers import SentenceTransformer
+from sklearn.decomposition import NMF
+from sklearn.feature_extraction.text import CountVectorizer
 from topmost.preprocessing import Preprocessing
 from pathlib import Path
 import logging
@@ -8,47 +16,283 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _hash_titles(titles: List[str]) -> str:
+    """Return a digest identifying an ordered list of titles."""
+    digest = hashlib.blake2b(digest_size=16)
+    for title in titles:
+        digest.update(title.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedPreprocessing(Preprocessing):
+    """Preprocessing that reuses its last result for the same list of texts.
+
+    FASTopic re-runs preprocessing on every fit, so refitting the same titles
+    (e.g. while tuning model settings) would otherwise re-tokenize them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_key = None
+        self._preprocessed = None
+
+    def preprocess(self, raw_train_texts, *args, pretrained_WE=True, **kwargs):
+        if args or kwargs:
+            # Only plain training-text calls are cached
+            return super().preprocess(
+                raw_train_texts, *args, pretrained_WE=pretrained_WE, **kwargs
+            )
+
+        cache_key = (_hash_titles(raw_train_texts), pretrained_WE)
+        if cache_key != self._cache_key:
+            self._preprocessed = super().preprocess(
+                raw_train_texts, pretrained_WE=pretrained_WE
+            )
+            self._cache_key = cache_key
+        else:
+            logger.info("Reusing preprocessed titles")
+        return self._preprocessed
+
+
+class DocEmbedder:
+    """Sentence-transformer document embedder for FASTopic.
+
+    The model is loaded on first use, so building a classifier stays cheap. On
+    CUDA, titles are encoded in large batches under fp16 autocast.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", device: str | None = None):
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = 512 if device.startswith("cuda") else 32
+        self.model = None
+
+    def encode(
+        self,
+        docs: List[str],
+        show_progress_bar: bool = False,
+        normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        if self.model is None:
+            self.model = SentenceTransformer(self.model_name, device=self.device)
+
+        if self.device.startswith("cuda"):
+            precision = torch.autocast("cuda", dtype=torch.float16)
+        else:
+            precision = nullcontext()
+
+        with precision:
+            embeddings = self.model.encode(
+                docs,
+                batch_size=self.batch_size,
+                show_progress_bar=show_progress_bar,
+                normalize_embeddings=normalize_embeddings,
+            )
+        # FASTopic trains in float32
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+class NMFTopicModel:
+    """Bag-of-words NMF topic model for histories too small to need FASTopic.
+
+    Mirrors the parts of the FASTopic interface used by TopicVideoClassifier.
+    """
+
+    def __init__(self, num_topics: int, num_top_words: int = 15):
+        self.num_topics = num_topics
+        self.num_top_words = num_top_words
+        self.vectorizer = CountVectorizer(stop_words="english")
+        self.nmf = None
+        self.top_words = None
+        self.doc_topic_dist = None
+
+    def fit_transform(self, docs: List[str]) -> Tuple[List[str], np.ndarray]:
+        try:
+            bow = self.vectorizer.fit_transform(docs)
+        except ValueError:
+            # CountVectorizer rejects an empty vocabulary, which only happens
+            # when no document has a word outside the stop words
+            analyzer = self.vectorizer.build_analyzer()
+            if any(analyzer(doc) for doc in docs):
+                raise
+            self.nmf = None
+            self.top_words = [""] * self.num_topics
+            self.doc_topic_dist = np.zeros((len(docs), self.num_topics))
+            return self.top_words, self.doc_topic_dist
+
+        # NNDSVD needs at least as many documents and words as topics
+        init = "nndsvd" if self.num_topics <= min(bow.shape) else "random"
+        self.nmf = NMF(n_components=self.num_topics, init=init, random_state=0)
+        doc_topic_weights = self.nmf.fit_transform(bow)
+
+        vocab = self.vectorizer.get_feature_names_out()
+        self.top_words = [
+            " ".join(vocab[np.argsort(topic)[: -(self.num_top_words + 1) : -1]])
+            for topic in self.nmf.components_
+        ]
+
+        # Normalize weights into per-document topic distributions. Documents
+        # without any known words keep an all-zero row, so they are not
+        # credited to any topic
+        totals = doc_topic_weights.sum(axis=1, keepdims=True)
+        self.doc_topic_dist = np.divide(
+            doc_topic_weights,
+            totals,
+            out=np.zeros_like(doc_topic_weights),
+            where=totals > 0,
+        )
+        return self.top_words, self.doc_topic_dist
+
+    def visualize_topic_weights(self, top_n: int = 50, height: int = 1000) -> go.Figure:
+        """Plot the average weight of the top_n topics as a bar chart."""
+        topic_weights = self.doc_topic_dist.mean(axis=0)
+        topic_idx = np.argsort(topic_weights)[-top_n:]
+        labels = [f"{i}_{'_'.join(self.top_words[i].split()[:5])}" for i in topic_idx]
+
+        fig = go.Figure(go.Bar(x=topic_weights[topic_idx], y=labels, orientation="h"))
+        fig.update_layout(
+            title="<b>Topic Weights</b>", xaxis_title="Weight", height=height
+        )
+        return fig
+
+
 class TopicVideoClassifier:
-    """Classifies YouTube videos based on their titles using FASTopic."""
+    """Classifies YouTube videos based on their titles using FASTopic.
+
+    Histories with fewer than ``min_titles_for_fastopic`` titles use a
+    lightweight NMF model instead, skipping FASTopic's embedding model.
+    """
 
-    def __init__(self, num_topics: int = 20):
+    def __init__(
+        self,
+        num_topics: int = 20,
+        min_titles_for_fastopic: int = 5000,
+        fastopic_epochs: int = 200,
+    ):
         self.num_topics = num_topics
-        self.preprocessing = Preprocessing(stopwords="English")
-        self.model = FASTopic(num_topics=num_topics, preprocessing=self.preprocessing)
+        self.min_titles_for_fastopic = min_titles_for_fastopic
+        self.fastopic_epochs = fastopic_epochs
+        self.preprocessing = CachedPreprocessing(stopwords="English")
+        self.doc_embedder = DocEmbedder()
+        self.model = None
+        self.small_model = NMFTopicModel(num_topics=num_topics)
+        self.fitted_model = None
         self.topic_keywords = None
         self.doc_topics = None
 
+    def _build_fastopic(self) -> FASTopic:
+        """Build an unfitted FASTopic model sharing the cached preprocessing.
+
+        A FASTopic instance cannot be fit twice, so every fit gets a new one.
+        The preprocessing cache and the loaded embedding model carry over.
+        """
+        return FASTopic(
+            num_topics=self.num_topics,
+            preprocessing=self.preprocessing,
+            doc_embed_model=self.doc_embedder,
+            epochs=self.fastopic_epochs,
+            device=self.doc_embedder.device,
+        )
+
     def _extract_topics(self, titles: List[str]) -> Tuple[List[List[str]], np.ndarray]:
-        """Extract topics from video titles using FASTopic."""
+        """Extract topics from video titles using FASTopic or NMF."""
         try:
-            topic_words, doc_topic_dist = self.model.fit_transform(titles)
+            if len(titles) < self.min_titles_for_fastopic:
+                logger.info(f"Using NMF topic model for {len(titles)} titles")
+                model = self.small_model
+            else:
+                self.model = self._build_fastopic()
+                model = self.model
+
+            topic_words, doc_topic_dist = model.fit_transform(titles)
+            self.fitted_model = model
+            # Single precision is plenty for topic proportions
+            doc_topic_dist = doc_topic_dist.astype(np.float32, copy=False)
             return topic_words, doc_topic_dist
         except Exception as e:
             logger.error(f"Error in topic extraction: {e}")
             raise
 
+    def fit(self, titles: List[str]) -> "TopicVideoClassifier":
+        """Fit the topic model on video titles.
+
+        Preprocessed titles are cached, so refitting FASTopic on the same titles
+        only re-runs the model.
+        """
+        self.topic_keywords, self.doc_topics = self._extract_topics(titles)
+        return self
+
+    @staticmethod
+    def _uncategorized(num_titles: int) -> Dict:
+        """Return an analysis that puts every title in a single category."""
+        return {
+            "topic_distributions": None,
+            "topic_keywords": [],
+            "dominant_topics": pd.Categorical.from_codes(
+                np.zeros(num_titles, dtype=np.int32), categories=["Uncategorized"]
+            ),
+        }
+
     def analyze_titles(self, titles: List[str]) -> Dict:
         """Analyze video titles and return topic information."""
-        if len(titles) < 2:
+        # Re-watched videos repeat their titles, so model each distinct title
+        # once and map the results back to every occurrence
+        title_codes, unique_titles = pd.factorize(pd.Series(titles, dtype=object))
+
+        if len(unique_titles) < 2:
             logger.warning("Not enough titles for meaningful topic analysis")
-            return {
-                "topic_distributions": None,
-                "topic_keywords": [],
-                "dominant_topics": ["Uncategorized"] * len(titles),
-            }
+            return self._uncategorized(len(titles))
 
         # Extract topics
-        self.topic_keywords, self.doc_topics = self._extract_topics(titles)
+        self.fit(unique_titles.tolist())
+        unique_doc_topics = self.doc_topics
+
+        # Titles without any topic words have an all-zero distribution
+        uncategorized = ~unique_doc_topics.any(axis=1)
+        if uncategorized.all():
+            logger.warning("No topic words found in titles")
+            self.topic_keywords = None
+            self.doc_topics = None
+            return self._uncategorized(len(titles))
+
+        # Get dominant topic for each distinct title, then for each document
+        dominant_topics = np.argmax(unique_doc_topics, axis=1).astype(np.int32)
 
-        # Get dominant topic for each document
-        dominant_topics = np.argmax(self.doc_topics, axis=1)
+        # Label topics through a categorical, formatting only the K labels
+        num_topics = unique_doc_topics.shape[1]
+        topic_labels = [f"Topic_{i}" for i in range(num_topics)]
+
+        if uncategorized.any():
+            dominant_topics[uncategorized] = num_topics
+            topic_labels.append("Uncategorized")
+
+        dominant_topics = dominant_topics[title_codes]
+        self.doc_topics = unique_doc_topics[title_codes]
 
         return {
             "topic_distributions": self.doc_topics,
             "topic_keywords": self.topic_keywords,
-            "dominant_topics": [f"Topic_{i}" for i in dominant_topics],
+            "dominant_topics": pd.Categorical.from_codes(
+                dominant_topics, categories=topic_labels
+            ),
         }
 
+    def quantize_doc_topics(self) -> Tuple[np.ndarray, float]:
+        """Quantize topic distributions to uint8 for compact persistence.
+
+        Returns the quantized array and the scale factor that maps it back to
+        probabilities (``quantized * scale``).
+        """
+        if self.doc_topics is None:
+            raise ValueError("No topic distributions available, call fit first")
+
+        scale = 1.0 / 255
+        quantized = np.rint(self.doc_topics / scale).astype(np.uint8)
+        return quantized, scale
+
     def visualize_topics(self, output_path: str | Path, top_n: int = 20) -> None:
         """Generate and save topic visualization."""
         if self.topic_keywords is None:
@@ -56,7 +300,7 @@ class TopicVideoClassifier:
             return
 
         try:
-            fig = self.model.visualize_topic_weights(top_n=top_n, height=800)
+            fig = self.fitted_model.visualize_topic_weights(top_n=top_n, height=800)
             fig.write_image(str(Path(output_path) / "topic_visualization.png"))
             logger.info(f"Topic visualization saved to {output_path}")
         except Exception as e:
@@ -1,18 +1,47 @@
 import logging
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from .parser import YouTubeHistoryParser
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_FORMATS = ("csv", "parquet", "feather")
 
-def process_watch_history(input_path: str, output_path: str) -> None:
-    """Process watch history from HTML to CSV."""
+
+def process_watch_history(
+    input_path: str,
+    output_path: str,
+    output_format: str | None = None,
+    cache_dir: str | Path | None = None,
+) -> None:
+    """Process watch history from HTML to CSV, Parquet or Feather.
+
+    The output format defaults to the extension of ``output_path``, falling
+    back to CSV. Parsed entries are cached in ``cache_dir`` when it is given.
+    """
     try:
+        if output_format is None:
+            suffix = Path(output_path).suffix.lstrip(".").lower()
+            output_format = suffix if suffix in OUTPUT_FORMATS else "csv"
+        output_format = output_format.lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                f"Unsupported output format '{output_format}', "
+                f"expected one of {OUTPUT_FORMATS}"
+            )
+
         # Parse watch history
-        parser = YouTubeHistoryParser(input_path)
+        parser = YouTubeHistoryParser(input_path, cache_dir=cache_dir)
         df = parser.parse_history()
 
-        # Export to CSV
-        df.to_csv(output_path, index=False)
+        if output_format == "parquet":
+            df.to_parquet(output_path, engine="pyarrow", compression="zstd")
+        elif output_format == "feather":
+            df.to_feather(output_path, compression="zstd")
+        else:
+            # Export to CSV with Arrow's multi-threaded C++ writer
+            pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), output_path)
         logger.info(f"Successfully exported watch history to {output_path}")
 
     except Exception as e:
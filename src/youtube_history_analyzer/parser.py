@@ -1,9 +1,13 @@
 from pathlib import Path
-from bs4 import BeautifulSoup
+from lxml import etree
 import pandas as pd
+import pyarrow as pa
+from contextlib import suppress
 from datetime import datetime
+import hashlib
 import logging
-from typing import Dict
+import os
+from typing import Iterator, Tuple
 from .classifier import TopicVideoClassifier
 
 # Configure logging
@@ -12,56 +16,119 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+COLUMNS = ["video", "video_url", "channel", "channel_url", "date"]
+OUTER_CELL_CLASS = "outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp"
+CONTENT_CELL_CLASS = "content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1"
+CONTENT_CELL_CLASSES = ["content-cell", "mdl-cell--6-col", "mdl-typography--body-1"]
+
+
+def _has_classes_xpath(classes) -> str:
+    """Build an XPath predicate matching elements that carry all given classes."""
+    return " and ".join(
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {c} ')" for c in classes
+    )
+
+
+# Compiled once at import and reused for every entry in the file
+_CONTENT_CELL_XPATH = etree.XPath(
+    f".//div[{_has_classes_xpath(CONTENT_CELL_CLASSES)}][1]"
+)
+_DIRECT_TEXT_XPATH = etree.XPath("text()", smart_strings=False)
+
+_MONTHS = {
+    month: number
+    for number, month in enumerate(
+        "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split(), start=1
+    )
+}
+
+# One parsed entry, with values in COLUMNS order
+WatchEntry = Tuple[str, str, str, str, str]
+
+# Bump when the cached DataFrame layout changes so stale caches are ignored
+PARSE_CACHE_VERSION = 1
+
 
 class YouTubeHistoryParser:
     """Parser for YouTube watch history HTML files exported from Google Takeout."""
 
-    def __init__(self, file_path: str | Path, output_dir: str | Path = "data/output"):
+    def __init__(
+        self,
+        file_path: str | Path,
+        output_dir: str | Path = "data/output",
+        cache_dir: str | Path | None = None,
+    ):
+        """
+        Args:
+            file_path: Path to the watch-history.html file.
+            output_dir: Directory for generated artifacts.
+            cache_dir: Directory where parsed entries are cached as Parquet,
+                keyed by the input file's path, modification time and size.
+                ``None`` disables the cache.
+        """
         self.file_path = Path(file_path)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
-        self.soup = None
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
         self.classifier = TopicVideoClassifier()
 
-    def _load_html(self) -> None:
-        """Load and parse HTML file using BeautifulSoup."""
+    def _iter_watch_entries(self) -> Iterator[etree._Element]:
+        """Stream watch entries from the HTML file as their outer cells close.
+
+        Each entry is cleared once the caller is done with it, and already
+        processed siblings are dropped, so the element tree stays bounded by a
+        single entry instead of the whole document. This bounds the DOM only:
+        libxml2's HTML push parser keeps the input it has read, so total memory
+        still grows with the size of the file.
+        """
         try:
-            with open(self.file_path, "r", encoding="utf-8") as file:
-                self.soup = BeautifulSoup(file, "html.parser")
-                logger.info(f"Successfully loaded {self.file_path}")
+            # libxml2 reads the raw bytes and decodes them once; Takeout
+            # exports are UTF-8, so skip charset detection
+            context = etree.iterparse(
+                str(self.file_path),
+                events=("end",),
+                tag="div",
+                html=True,
+                encoding="utf-8",
+            )
+            logger.info(f"Streaming watch entries from {self.file_path}")
+            for _, elem in context:
+                if elem.get("class") != OUTER_CELL_CLASS:
+                    continue
+
+                yield elem
+
+                # Release the parsed entry and everything before it
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
         except Exception as e:
             logger.error(f"Error loading file: {e}")
             raise
 
-    def _parse_watch_entry(self, entry) -> Dict:
+    def _parse_watch_entry(self, entry) -> WatchEntry | None:
         """Parse a single watch history entry."""
         try:
             # First verify we have a valid entry
-            if not entry:
+            if entry is None:
                 logger.warning("Empty entry provided to _parse_watch_entry")
                 return None
 
-            # Find the content cell with the correct class
-            # Note: Using find with partial class match
-            content = entry.find(
-                "div",
-                class_=lambda x: x
-                and all(
-                    c in x
-                    for c in [
-                        "content-cell",
-                        "mdl-cell--6-col",
-                        "mdl-typography--body-1",
-                    ]
-                ),
-            )
-
-            if not content:
-                logger.debug("Could not find content cell")
-                return None
+            # Takeout lays every entry out as outer cell > grid > (header
+            # cell, content cell, ...), so look at that position first and
+            # only search by class when the layout differs
+            content = None
+            if len(entry) and len(entry[0]) > 1:
+                content = entry[0][1]
+            if content is None or content.get("class") != CONTENT_CELL_CLASS:
+                matches = _CONTENT_CELL_XPATH(entry)
+                if not matches:
+                    logger.debug("Could not find content cell")
+                    return None
+                content = matches[0]
 
             # Extract video information
-            links = content.find_all("a")
+            links = content.findall(".//a")
             if len(links) < 2:
                 logger.debug(f"Not enough links found in entry: {len(links)}")
                 return None
@@ -70,54 +137,120 @@ class YouTubeHistoryParser:
             video_link = links[0]
             channel_link = links[1]
 
-            # Get date from the text content
-            text_content = content.get_text(separator="\n", strip=True)
-            date_text = text_content.split("\n")[-1]
-
-            # Parse date
-            try:
-                date = datetime.strptime(date_text, "%b %d, %Y, %I:%M:%S %p %Z")
-            except ValueError as e:
-                logger.warning(f"Could not parse date '{date_text}': {e}")
-                return None
+            # The date is the last text node directly inside the content cell
+            date_text = next(
+                (
+                    text.strip()
+                    for text in reversed(_DIRECT_TEXT_XPATH(content))
+                    if text.strip()
+                ),
+                "",
+            )
 
-            return {
-                "video": video_link.text.strip(),
-                "video_url": video_link["href"],
-                "channel": channel_link.text.strip(),
-                "channel_url": channel_link["href"],
-                "date": date,
-            }
+            return (
+                "".join(video_link.itertext()).strip(),
+                video_link.attrib["href"],
+                "".join(channel_link.itertext()).strip(),
+                channel_link.attrib["href"],
+                date_text,
+            )
         except Exception as e:
             logger.warning(f"Error parsing entry: {e}")
             return None
 
-    def parse_history(self) -> pd.DataFrame:
-        """Parse the entire watch history and return as DataFrame."""
-        if not self.soup:
-            self._load_html()
+    def _load_entries(self) -> pd.DataFrame:
+        """Stream and parse all watch entries into a DataFrame."""
+        # Collect each field into its own column list
+        videos, video_urls, channels, channel_urls, dates = [], [], [], [], []
+        num_watch_entries = 0
 
-        entries = []
-        watch_entries = self.soup.find_all(
-            "div", class_="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp"
-        )
-
-        logger.info(f"Found {len(watch_entries)} potential watch entries")
-
-        for entry in watch_entries:
+        for entry in self._iter_watch_entries():
+            num_watch_entries += 1
             parsed_entry = self._parse_watch_entry(entry)
             if parsed_entry:
-                entries.append(parsed_entry)
+                video, video_url, channel, channel_url, date = parsed_entry
+                videos.append(video)
+                video_urls.append(video_url)
+                channels.append(channel)
+                channel_urls.append(channel_url)
+                dates.append(date)
 
-        logger.info(f"Successfully parsed {len(entries)} watch history entries")
+        logger.info(f"Found {num_watch_entries} potential watch entries")
+        logger.info(f"Successfully parsed {len(videos)} watch history entries")
 
-        if not entries:
+        if not videos:
             logger.warning("No entries were successfully parsed")
-            return pd.DataFrame(
-                columns=["video", "video_url", "channel", "channel_url", "date"]
-            )
+            return pd.DataFrame(columns=COLUMNS)
 
-        df = pd.DataFrame(entries)
+        df = pd.DataFrame(
+            {
+                "video": videos,
+                "video_url": video_urls,
+                # Channels repeat throughout a history, so intern them
+                "channel": pd.Categorical(channels),
+                "channel_url": pd.Categorical(channel_urls),
+                "date": dates,
+            },
+            columns=COLUMNS,
+        )
+
+        # Convert all dates in one pass once the file has been streamed
+        df["date"] = pd.DatetimeIndex([_parse_takeout_date(d) for d in df["date"]])
+        invalid_dates = df["date"].isna()
+        if invalid_dates.any():
+            logger.warning(f"Could not parse {invalid_dates.sum()} entry dates")
+            df = df[~invalid_dates].reset_index(drop=True)
+
+        return df
+
+    def _load_entries_cached(self) -> pd.DataFrame:
+        """Load parsed entries from the cache, parsing the file on a miss."""
+        if self.cache_dir is None:
+            return self._load_entries()
+
+        try:
+            stat = self.file_path.stat()
+        except OSError as e:
+            logger.error(f"Error loading file: {e}")
+            raise
+
+        path_hash = hashlib.blake2b(
+            str(self.file_path.resolve()).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        cache_path = self.cache_dir / (
+            f"yhist_{path_hash}_{stat.st_mtime_ns}_{stat.st_size}"
+            f"_v{PARSE_CACHE_VERSION}.parquet"
+        )
+
+        if cache_path.exists():
+            try:
+                df = pd.read_parquet(cache_path, engine="pyarrow")
+                logger.info(f"Loaded {len(df)} cached watch entries from {cache_path}")
+                return df
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache {cache_path}: {e}")
+
+        df = self._load_entries()
+
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            # Drop caches of earlier versions of the same file
+            for stale_path in self.cache_dir.glob(f"yhist_{path_hash}_*.parquet"):
+                stale_path.unlink(missing_ok=True)
+
+            # Write to a temporary file first so readers never see partial data
+            df.to_parquet(tmp_path, engine="pyarrow", compression="zstd")
+            os.replace(tmp_path, cache_path)
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Could not write cache {cache_path}: {e}")
+            with suppress(OSError):
+                tmp_path.unlink(missing_ok=True)
+
+        return df
+
+    def parse_history(self) -> pd.DataFrame:
+        """Parse the entire watch history and return as DataFrame."""
+        df = self._load_entries_cached()
 
         if not df.empty:
             # Get topic-based categories
@@ -131,3 +264,32 @@ class YouTubeHistoryParser:
             self.topic_keywords = classification["topic_keywords"]
 
         return df
+
+
+def _parse_takeout_date(date_text: str) -> datetime | None:
+    """Parse a Takeout timestamp such as "Feb 23, 2024, 7:36:45 PM EST".
+
+    Specialized for this single layout, which is several times faster than
+    going through a strptime-style format. The trailing time zone abbreviation
+    is ignored and a naive datetime is returned, or None if the text does not
+    match.
+    """
+    try:
+        month, day, year, clock, meridiem, *zone = date_text.replace(",", "").split()
+        hour, minute, second = clock.split(":")
+        hour = int(hour)
+        meridiem = meridiem.upper()
+        if len(zone) > 1 or not 1 <= hour <= 12 or meridiem not in ("AM", "PM"):
+            return None
+
+        hour = hour % 12 + (12 if meridiem == "PM" else 0)
+        return datetime(
+            int(year),
+            _MONTHS[month.capitalize()],
+            int(day),
+            hour,
+            int(minute),
+            int(second),
+        )
+    except (ValueError, KeyError):
+        return None
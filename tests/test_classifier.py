@@ -1,5 +1,9 @@
+import logging
 import pytest
 import numpy as np
+import pandas as pd
+from topmost.preprocessing import Preprocessing
+from youtube_history_analyzer import classifier as classifier_module
 from youtube_history_analyzer.classifier import TopicVideoClassifier
 
 
@@ -17,6 +21,26 @@ def sample_titles():
     ]
 
 
+class FakeSentenceTransformer:
+    """Stand-in for SentenceTransformer that needs no downloaded model."""
+
+    def __init__(self, model_name, device=None):
+        self.rng = np.random.default_rng(0)
+
+    def encode(self, docs, **kwargs):
+        return self.rng.random((len(docs), 16), dtype=np.float32)
+
+
+@pytest.fixture
+def fastopic_classifier(monkeypatch):
+    monkeypatch.setattr(
+        classifier_module, "SentenceTransformer", FakeSentenceTransformer
+    )
+    return TopicVideoClassifier(
+        num_topics=3, min_titles_for_fastopic=0, fastopic_epochs=2
+    )
+
+
 @pytest.fixture
 def classifier():
     return TopicVideoClassifier(num_topics=5)
@@ -45,3 +69,125 @@ def test_small_dataset_handling(classifier):
 
     assert len(result["categories"]) == 1
     assert result["categories"][0] == "Uncategorized"
+
+
+def test_stop_word_titles_are_uncategorized(classifier, caplog):
+    result = classifier.get_video_categories(["The", "A", "it is"])
+
+    assert list(result["categories"]) == ["Uncategorized"] * 3
+    assert result["topic_keywords"] == []
+    assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+
+
+def test_topic_model_errors_are_raised(classifier, sample_titles, monkeypatch):
+    def broken_fit_transform(docs):
+        raise ValueError("broken topic model")
+
+    monkeypatch.setattr(classifier.small_model, "fit_transform", broken_fit_transform)
+
+    with pytest.raises(ValueError, match="broken topic model"):
+        classifier.analyze_titles(sample_titles)
+
+
+def test_stop_word_titles_among_others_are_uncategorized(classifier):
+    titles = [
+        "Python tutorial basics",
+        "Gaming montage epic",
+        "Tech news today",
+        "The",
+        "it is",
+    ]
+    analysis = classifier.analyze_titles(titles)
+
+    dominant_topics = list(analysis["dominant_topics"])
+    assert dominant_topics[-2:] == ["Uncategorized", "Uncategorized"]
+    assert "Uncategorized" not in dominant_topics[:3]
+    np.testing.assert_array_equal(analysis["topic_distributions"][-2:], 0)
+
+
+def test_preprocessing_is_cached(classifier, sample_titles):
+    preprocessing = classifier.preprocessing
+
+    first = preprocessing.preprocess(sample_titles, pretrained_WE=False)
+    assert preprocessing.preprocess(sample_titles, pretrained_WE=False) is first
+
+    changed = preprocessing.preprocess(sample_titles[:-1], pretrained_WE=False)
+    assert changed is not first
+
+
+def test_quantize_doc_topics(classifier):
+    classifier.doc_topics = np.array([[0.1, 0.7, 0.2], [0.5, 0.25, 0.25]], np.float32)
+
+    quantized, scale = classifier.quantize_doc_topics()
+
+    assert quantized.dtype == np.uint8
+    np.testing.assert_allclose(quantized * scale, classifier.doc_topics, atol=scale)
+    np.testing.assert_array_equal(
+        np.argmax(quantized, axis=1), np.argmax(classifier.doc_topics, axis=1)
+    )
+
+
+def test_small_history_uses_nmf(classifier, sample_titles):
+    analysis = classifier.analyze_titles(sample_titles)
+
+    assert classifier.fitted_model is classifier.small_model
+    assert isinstance(analysis["dominant_topics"], pd.Categorical)
+    assert list(analysis["dominant_topics"].categories) == [
+        f"Topic_{i}" for i in range(5)
+    ]
+    assert analysis["topic_distributions"].shape == (len(sample_titles), 5)
+    np.testing.assert_allclose(
+        analysis["topic_distributions"].sum(axis=1), 1, rtol=1e-5
+    )
+
+
+def test_duplicate_titles_share_topics(classifier, sample_titles):
+    titles = sample_titles + sample_titles[:3]
+    analysis = classifier.analyze_titles(titles)
+
+    assert analysis["topic_distributions"].shape == (len(titles), 5)
+    assert len(analysis["dominant_topics"]) == len(titles)
+    np.testing.assert_array_equal(
+        analysis["topic_distributions"][-3:], analysis["topic_distributions"][:3]
+    )
+    assert list(analysis["dominant_topics"][-3:]) == list(
+        analysis["dominant_topics"][:3]
+    )
+
+
+def test_doc_embedder_loads_lazily(classifier):
+    assert classifier.doc_embedder.model is None
+    assert classifier._build_fastopic().device == classifier.doc_embedder.device
+
+
+def test_fastopic_refit_reuses_preprocessing(
+    fastopic_classifier, sample_titles, monkeypatch
+):
+    calls = []
+    preprocess = Preprocessing.preprocess
+
+    def counting_preprocess(self, *args, **kwargs):
+        calls.append(args)
+        return preprocess(self, *args, **kwargs)
+
+    monkeypatch.setattr(Preprocessing, "preprocess", counting_preprocess)
+
+    fastopic_classifier.fit(sample_titles)
+    first_model = fastopic_classifier.fitted_model
+    fastopic_classifier.fit(sample_titles)
+
+    assert len(calls) == 1
+    assert fastopic_classifier.fitted_model is not first_model
+    assert isinstance(fastopic_classifier.doc_embedder.model, FakeSentenceTransformer)
+    assert fastopic_classifier.doc_topics.shape == (len(sample_titles), 3)
+
+
+def test_fastopic_path(fastopic_classifier, sample_titles):
+    analysis = fastopic_classifier.analyze_titles(sample_titles)
+
+    model = fastopic_classifier.fitted_model
+    assert model is fastopic_classifier.model
+    assert model.doc_embedder.model is fastopic_classifier.doc_embedder
+    assert analysis["topic_distributions"].dtype == np.float32
+    assert analysis["topic_distributions"].shape == (len(sample_titles), 3)
+    assert len(analysis["topic_keywords"]) == 3
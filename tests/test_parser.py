@@ -1,10 +1,15 @@
 import pytest
 import pandas as pd
+import pyarrow as pa
 from datetime import datetime
-from bs4 import BeautifulSoup
+from lxml import etree
 from pathlib import Path
 
-from youtube_history_analyzer.parser import YouTubeHistoryParser
+from youtube_history_analyzer.parser import (
+    OUTER_CELL_CLASS,
+    YouTubeHistoryParser,
+    _parse_takeout_date,
+)
 from youtube_history_analyzer.cli import process_watch_history
 
 
@@ -50,56 +55,100 @@ def parser(sample_html_file):
 def test_parser_initialization(parser):
     """Test parser initialization"""
     assert isinstance(parser.file_path, Path)
-    assert parser.soup is None
 
 
-def test_load_html(parser):
-    """Test HTML loading functionality"""
-    parser._load_html()
-    assert parser.soup is not None
-    assert isinstance(parser.soup, BeautifulSoup)
+def test_iter_watch_entries(parser):
+    """Test streaming of watch entries from the HTML file"""
+    entries = parser._iter_watch_entries()
+    entry = next(entries)
+    assert entry.tag == "div"
+    assert entry.get("class") == OUTER_CELL_CLASS
+    assert next(entries, None) is None
 
 
 def test_parse_watch_entry(parser):
     """Test parsing of a single watch entry"""
-    parser._load_html()
-
     # Find the entry
-    entry = parser.soup.find(
-        "div", class_="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp"
-    )
+    entry = next(parser._iter_watch_entries(), None)
     assert entry is not None, "Could not find the outer cell div"
 
     # Debug print
     print("\nTesting entry structure:")
-    print(entry.prettify())
+    print(etree.tostring(entry, pretty_print=True, encoding="unicode"))
 
     result = parser._parse_watch_entry(entry)
 
     # Detailed assertion messages
     assert result is not None, "Parser returned None instead of a valid entry"
+    video, video_url, channel, channel_url, date_text = result
 
     expected_video = "Test Video"
     assert (
-        result["video"] == expected_video
-    ), f"Expected video title '{expected_video}', got '{result['video']}'"
+        video == expected_video
+    ), f"Expected video title '{expected_video}', got '{video}'"
 
     expected_url = "https://www.youtube.com/watch?v=123"
     assert (
-        result["video_url"] == expected_url
-    ), f"Expected video URL '{expected_url}', got '{result['video_url']}'"
+        video_url == expected_url
+    ), f"Expected video URL '{expected_url}', got '{video_url}'"
 
     expected_channel = "Test Channel"
     assert (
-        result["channel"] == expected_channel
-    ), f"Expected channel '{expected_channel}', got '{result['channel']}'"
+        channel == expected_channel
+    ), f"Expected channel '{expected_channel}', got '{channel}'"
 
     expected_channel_url = "https://www.youtube.com/channel/456"
     assert (
-        result["channel_url"] == expected_channel_url
-    ), f"Expected channel URL '{expected_channel_url}', got '{result['channel_url']}'"
+        channel_url == expected_channel_url
+    ), f"Expected channel URL '{expected_channel_url}', got '{channel_url}'"
+
+    expected_date = "Feb 23, 2024, 7:36:45 PM EST"
+    assert (
+        date_text == expected_date
+    ), f"Expected date text '{expected_date}', got '{date_text}'"
+
+
+def test_parse_watch_entry_unexpected_layout(tmp_path, sample_html_content):
+    """Test that the content cell is still found when it is not in position"""
+    # Drop the header cell so the content cell moves to the first position
+    start = sample_html_content.index('<div class="header-cell')
+    end = sample_html_content.index('<div class="content-cell')
+    file_path = tmp_path / "no-header-watch-history.html"
+    file_path.write_text(sample_html_content[:start] + sample_html_content[end:])
+
+    parser = YouTubeHistoryParser(file_path)
+    result = parser._parse_watch_entry(next(parser._iter_watch_entries()))
+    assert result is not None
+    assert result[0] == "Test Video"
+
 
-    assert isinstance(result["date"], datetime), "Date should be a datetime object"
+def test_parse_watch_entry_non_ascii(tmp_path, sample_html_content):
+    """Test that UTF-8 titles are decoded without a charset declaration"""
+    file_path = tmp_path / "non-ascii-watch-history.html"
+    file_path.write_text(
+        sample_html_content.replace("Test Video", "Vidéo de prueba 日本"),
+        encoding="utf-8",
+    )
+
+    parser = YouTubeHistoryParser(file_path)
+    video, *_ = parser._parse_watch_entry(next(parser._iter_watch_entries()))
+    assert video == "Vidéo de prueba 日本"
+
+
+@pytest.mark.parametrize(
+    "date_text, expected",
+    [
+        ("Feb 23, 2024, 7:36:45 PM EST", datetime(2024, 2, 23, 19, 36, 45)),
+        ("Dec 1, 2023, 12:05:09 AM PDT", datetime(2023, 12, 1, 0, 5, 9)),
+        ("Jul 4, 2022, 12:00:00 PM", datetime(2022, 7, 4, 12, 0, 0)),
+        ("Feb 30, 2024, 7:36:45 PM EST", None),
+        ("Feb 23, 2024, 13:36:45 PM EST", None),
+        ("Not a date", None),
+    ],
+)
+def test_parse_takeout_date(date_text, expected):
+    """Test the specialized Takeout timestamp parser"""
+    assert _parse_takeout_date(date_text) == expected
 
 
 def test_parse_history(parser):
@@ -116,6 +165,56 @@ def test_parse_history(parser):
         "date",
         "category",
     ]
+    assert df["date"].iloc[0] == pd.Timestamp("2024-02-23 19:36:45")
+    assert isinstance(df["channel"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["channel_url"].dtype, pd.CategoricalDtype)
+
+
+def test_parse_history_drops_invalid_dates(tmp_path, sample_html_content):
+    """Test that entries with unparseable dates are dropped"""
+    file_path = tmp_path / "bad-date-watch-history.html"
+    file_path.write_text(
+        sample_html_content.replace("Feb 23, 2024, 7:36:45 PM EST", "Not a date")
+    )
+
+    df = YouTubeHistoryParser(file_path).parse_history()
+    assert len(df) == 0
+
+
+def test_parse_history_uses_cache(sample_html_file, tmp_path, monkeypatch):
+    """Test that a second parse of an unchanged file is served from the cache"""
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    first_df = YouTubeHistoryParser(
+        sample_html_file, cache_dir=cache_dir
+    ).parse_history()
+    assert len(list(cache_dir.glob("*.parquet"))) == 1
+
+    def fail_streaming(self):
+        raise AssertionError("HTML file was parsed again")
+
+    monkeypatch.setattr(YouTubeHistoryParser, "_iter_watch_entries", fail_streaming)
+    second_df = YouTubeHistoryParser(
+        sample_html_file, cache_dir=cache_dir
+    ).parse_history()
+    pd.testing.assert_frame_equal(second_df, first_df)
+
+
+def test_parse_history_cache_write_failure(sample_html_file, tmp_path, monkeypatch):
+    """Test that a failed cache write neither aborts parsing nor leaves files"""
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    def failing_to_parquet(self, path, *args, **kwargs):
+        Path(path).write_bytes(b"partial")
+        raise pa.ArrowInvalid("cannot write")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", failing_to_parquet)
+    df = YouTubeHistoryParser(sample_html_file, cache_dir=cache_dir).parse_history()
+
+    assert len(df) == 1
+    assert list(cache_dir.iterdir()) == []
 
 
 def test_parse_history_with_real_file():
@@ -154,23 +253,22 @@ def test_invalid_entry_structure(tmp_path):
     assert len(df) == 0  # Should handle invalid entries gracefully
 
 
-def test_debug_soup_structure(sample_html_file):
-    """Debug test to print out the soup structure"""
-    parser = YouTubeHistoryParser(sample_html_file)
-    parser._load_html()
+def test_debug_tree_structure(sample_html_file):
+    """Debug test to print out the document tree structure"""
+    tree = etree.parse(str(sample_html_file), etree.HTMLParser())
 
     # Print out all outer-cell divs
-    outer_cells = parser.soup.find_all("div", class_="outer-cell mdl-cell--12-col")
+    outer_cells = tree.xpath('//div[@class="outer-cell mdl-cell--12-col"]')
     print(f"\nNumber of outer cells found: {len(outer_cells)}")
 
     # Print out all content cells
-    content_cells = parser.soup.find_all("div", class_="content-cell mdl-cell--6-col")
+    content_cells = tree.xpath('//div[@class="content-cell mdl-cell--6-col"]')
     print(f"Number of content cells found: {len(content_cells)}")
 
     # If we find cells, print the first one for inspection
     if content_cells:
         print("\nFirst content cell structure:")
-        print(content_cells[0].prettify())
+        print(etree.tostring(content_cells[0], pretty_print=True, encoding="unicode"))
 
 
 def test_cli_process_watch_history(tmp_path, sample_html_content):
@@ -187,16 +285,67 @@ def test_cli_process_watch_history(tmp_path, sample_html_content):
     assert len(df) == 1
 
 
-def test_debug_html_structure(parser):
+@pytest.mark.parametrize(
+    "suffix, read", [(".parquet", pd.read_parquet), (".feather", pd.read_feather)]
+)
+def test_cli_process_watch_history_binary_output(
+    tmp_path, sample_html_content, suffix, read
+):
+    """Test the CLI processing function with columnar output formats"""
+    input_file = tmp_path / "test-watch-history.html"
+    output_file = tmp_path / f"output{suffix}"
+
+    input_file.write_text(sample_html_content)
+
+    process_watch_history(str(input_file), str(output_file))
+
+    assert output_file.exists()
+    df = read(output_file)
+    assert len(df) == 1
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+
+
+def test_cli_process_watch_history_explicit_format(tmp_path, sample_html_content):
+    """Test that an explicit output format is matched case-insensitively"""
+    input_file = tmp_path / "test-watch-history.html"
+    output_file = tmp_path / "output.data"
+
+    input_file.write_text(sample_html_content)
+
+    process_watch_history(str(input_file), str(output_file), output_format="PARQUET")
+
+    df = pd.read_parquet(output_file)
+    assert len(df) == 1
+
+
+def test_cli_process_watch_history_uses_cache(tmp_path, sample_html_file, monkeypatch):
+    """Test that the CLI reuses entries cached by an earlier parse"""
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    output_file = tmp_path / "output.csv"
+
+    YouTubeHistoryParser(sample_html_file, cache_dir=cache_dir).parse_history()
+
+    def fail_streaming(self):
+        raise AssertionError("HTML file was parsed again")
+
+    monkeypatch.setattr(YouTubeHistoryParser, "_iter_watch_entries", fail_streaming)
+    process_watch_history(
+        str(sample_html_file), str(output_file), cache_dir=str(cache_dir)
+    )
+
+    assert len(pd.read_csv(output_file)) == 1
+
+
+def test_debug_html_structure(sample_html_file):
     """Debug test to understand HTML structure"""
-    parser._load_html()
+    tree = etree.parse(str(sample_html_file), etree.HTMLParser())
 
     # Find all relevant elements
-    outer_cells = parser.soup.find_all(
-        "div", class_="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp"
-    )
-    content_cells = parser.soup.find_all(
-        "div", class_=lambda x: x and "content-cell" in x and "mdl-cell--6-col" in x
+    outer_cells = tree.xpath(f'//div[@class="{OUTER_CELL_CLASS}"]')
+    content_cells = tree.xpath(
+        "//div[contains(concat(' ', normalize-space(@class), ' '), ' content-cell ')"
+        " and contains(concat(' ', normalize-space(@class), ' '), ' mdl-cell--6-col ')]"
     )
 
     print("\nStructure Analysis:")
@@ -207,4 +356,7 @@ def test_debug_html_structure(parser):
         print("\nFirst outer cell classes:", outer_cells[0].get("class"))
     if content_cells:
         print("\nFirst content cell classes:", content_cells[0].get("class"))
-        print("\nFirst content cell text:", content_cells[0].get_text(strip=True))
+        print(
+            "\nFirst content cell text:",
+            "".join(t.strip() for t in content_cells[0].itertext()),
+        )